@@ -14,17 +14,28 @@ provide HUB_CONFIG and HUB_DB_PATH environment variables if desired.
 """
 
 import asyncio
+import functools
+import hmac
 import json
+import logging
 import os
+import signal
 import sqlite3
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
 
 import httpx
+import orjson
 from fastapi import Depends, FastAPI, Header, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
@@ -34,38 +45,117 @@ from fastapi.responses import StreamingResponse
 CONFIG_PATH = os.environ.get("HUB_CONFIG", os.path.join(os.path.dirname(__file__), "config.json"))
 DB_PATH = os.environ.get("HUB_DB_PATH", os.path.join(os.path.dirname(__file__), "hub.db"))
 
+# RC paths the hub calls; their full URLs are prepared per node at load time.
+_RC_ENDPOINTS = (
+    "core/stats",
+    "config/listremotes",
+    "operations/copyfs",
+    "operations/movefs",
+    "sync/sync",
+    "job/stop",
+)
+
 
-def load_config() -> Dict[str, Any]:
+def load_config(missing_ok: bool = True) -> Dict[str, Any]:
     """Load the JSON configuration file.
 
     The configuration has the following structure:
         {
             "nodes": [
                 {"id": "home-nas", "name": "Home NAS", "ip": "100.x.y.z", "port": 55743},
+                {"id": "vps", "name": "VPS", "ip": "...", "port": 443, "scheme": "https", "http2": true},
                 ...
             ],
             "api_key": "optional-secret"
         }
+
+    Each node also gets a precomputed `_base_url` and an `_endpoints` map of
+    full URLs for `_RC_ENDPOINTS`, so `rc_call` does not format them per call,
+    and a `_public` dict with the fields that are safe to return to clients.
+
+    A missing file yields an empty configuration unless `missing_ok` is false,
+    in which case `FileNotFoundError` is raised.
     """
     try:
         with open(CONFIG_PATH, "r", encoding="utf-8") as f:
             data = json.load(f)
     except FileNotFoundError:
+        if not missing_ok:
+            raise
         data = {"nodes": [], "api_key": ""}
     # index by id for quick lookup
     nodes = {}
     for node in data.get("nodes", []):
+        base_url = f"{node.get('scheme', 'http')}://{node['ip']}:{node['port']}/rc/"
+        node["_base_url"] = base_url
+        node["_endpoints"] = {path: base_url + path for path in _RC_ENDPOINTS}
+        node["_public"] = {"id": node["id"], "name": node.get("name")}
         nodes[node["id"]] = node
-    return {"nodes": nodes, "api_key": data.get("api_key", "")}
+    # `"api_key": null` means no key, like an empty string
+    api_key = data.get("api_key") or ""
+    # pre-encoded for constant-time comparison in verify_api_key
+    return {"nodes": nodes, "api_key": api_key, "_api_key_bytes": api_key.encode()}
+
+
+# How often (seconds) get_config() stats the config file for changes.
+CONFIG_CHECK_INTERVAL = 60.0
+
+_CFG_CACHE: Dict[str, Any] = {"mtime": None, "cfg": None, "checked_at": 0.0}
+
 
+def _config_mtime() -> Optional[float]:
+    try:
+        return os.stat(CONFIG_PATH).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _refresh_config(mtime: Optional[float]) -> bool:
+    """Parse the config file into the cache; return False if it was invalid.
+
+    A broken or missing file (e.g. one that is half written, or briefly
+    deleted during a deploy) leaves the last good configuration in place
+    rather than falling back to an empty one, which would disable the API
+    key.  Only at startup, with no previous config, does a missing file give
+    the empty default and a broken one raise.
+    """
+    try:
+        cfg = load_config(missing_ok=_CFG_CACHE["cfg"] is None)
+    except Exception:
+        if _CFG_CACHE["cfg"] is None:
+            raise
+        logger.exception("Failed to load %s; keeping the previous configuration", CONFIG_PATH)
+        return False
+    _CFG_CACHE.update(cfg=cfg, mtime=mtime)
+    return True
 
-CONFIG = load_config()
 
+def get_config() -> Dict[str, Any]:
+    """Return the cached configuration, re-reading the file only when it changed.
 
-def reload_config() -> None:
-    """Reload configuration from file (can be called on demand)."""
-    global CONFIG
-    CONFIG = load_config()
+    The file is stat'ed at most once every `CONFIG_CHECK_INTERVAL` seconds and
+    parsed again only if its modification time differs from the cached one.
+    """
+    now = time.monotonic()
+    cfg = _CFG_CACHE["cfg"]
+    if cfg is not None and now - _CFG_CACHE["checked_at"] < CONFIG_CHECK_INTERVAL:
+        return cfg
+    mtime = _config_mtime()
+    if cfg is None or mtime != _CFG_CACHE["mtime"]:
+        _refresh_config(mtime)
+    _CFG_CACHE["checked_at"] = now
+    return _CFG_CACHE["cfg"]
+
+
+def reload_config() -> bool:
+    """Reload configuration from file (can be called on demand).
+
+    Returns False if the file could not be loaded and the previous
+    configuration was kept.
+    """
+    ok = _refresh_config(_config_mtime())
+    _CFG_CACHE["checked_at"] = time.monotonic()
+    return ok
 
 
 # ---------------------------------------------------------------------------
@@ -73,10 +163,31 @@ def reload_config() -> None:
 # ---------------------------------------------------------------------------
 
 def get_db() -> sqlite3.Connection:
-    """Return a thread‑safe SQLite connection in WAL mode."""
-    con = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+    """Open a new SQLite connection in WAL mode for the calling thread.
+
+    The connection uses the default deferred transaction mode, so every write
+    must run inside a `with con:` block which commits (or rolls back) it.
+    Rows are returned as `sqlite3.Row`.  Use `get_conn` rather than calling
+    this directly.
+    """
+    con = sqlite3.connect(DB_PATH)
+    con.row_factory = sqlite3.Row
     con.execute("PRAGMA journal_mode=WAL")
-    # create jobs table if it doesn't exist
+    # WAL makes synchronous=NORMAL safe: fsync happens per checkpoint, not per commit
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+    con.execute("PRAGMA mmap_size=1073741824")
+    con.execute("PRAGMA busy_timeout=5000")
+    con.execute("PRAGMA wal_autocheckpoint=1000")
+    return con
+
+
+def _init_schema(con: sqlite3.Connection) -> None:
+    """Create the tables and indexes if they do not exist yet.
+
+    Called once at startup rather than for every new connection.
+    """
     con.execute(
         """
         CREATE TABLE IF NOT EXISTS jobs(
@@ -95,77 +206,287 @@ def get_db() -> sqlite3.Connection:
         )
         """
     )
+    con.execute("PRAGMA optimize")
+
+
+_tls = threading.local()
+
+
+def get_conn() -> sqlite3.Connection:
+    """Return the calling thread's SQLite connection, opening it on first use."""
+    con = getattr(_tls, "conn", None)
+    if con is None:
+        con = _tls.conn = get_db()
     return con
 
 
-DB_CONN = get_db()
+# Database work never runs on the event loop, so commits and WAL checkpoints
+# cannot stall it.  Writes go to a single thread, which serialises them; reads
+# run on a small pool whose threads each hold their own connection, so WAL's
+# concurrent readers are actually used.
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hub-db")
+DB_READ_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hub-db-read")
+
+T = TypeVar("T")
+
+
+async def run_db(fn: Callable[..., T], *args: Any) -> T:
+    """Run a blocking database function on the writer thread and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, functools.partial(fn, *args))
+
+
+async def run_db_read(fn: Callable[..., T], *args: Any) -> T:
+    """Run a read-only database function on the reader pool and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(DB_READ_EXECUTOR, functools.partial(fn, *args))
+
+
+async def db_exec(sql: str, params: Tuple[Any, ...] = ()) -> List[Any]:
+    """Execute a single read-only statement on the reader pool and return all rows."""
+    return await run_db_read(lambda: get_conn().execute(sql, params).fetchall())
+
+
+# Interval (seconds) between `PRAGMA optimize` runs.
+DB_OPTIMIZE_INTERVAL = 15 * 60
+
+
+async def optimize_db_forever() -> None:
+    """Periodically let SQLite refresh its query planner statistics.
+
+    A failed run (e.g. SQLITE_BUSY) is logged and retried at the next interval.
+    """
+    while True:
+        await asyncio.sleep(DB_OPTIMIZE_INTERVAL)
+        # may write sqlite_stat1, so it runs on the writer thread
+        try:
+            await run_db(lambda: get_conn().execute("PRAGMA optimize"))
+        except Exception:
+            logger.exception("PRAGMA optimize failed")
 
 
 # ---------------------------------------------------------------------------
 # Helper functions
 # ---------------------------------------------------------------------------
 
-async def rc_call(node: Dict[str, Any], path: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 300.0) -> Any:
-    """Call a JSON‑RPC method on the specified rclone node.
+async def rc_call_bytes(
+    node: Dict[str, Any], path: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 300.0
+) -> bytes:
+    """Call a JSON‑RPC method on the specified rclone node and return the raw body.
+
+    The request goes through the shared clients created in `lifespan`, so
+    connections to each node are pooled and kept alive between calls.  Nodes
+    with `http2` enabled use the HTTP/2 client (see `_client_for`), which
+    multiplexes concurrent calls over a single connection.
 
-    :param node: a node dictionary with keys `ip` and `port`
+    :param node: a node dictionary as prepared by `load_config`
     :param path: rc path like "operations/list"
     :param payload: JSON payload to send (will be {} if None)
     :param timeout: request timeout in seconds
     :raises HTTPException: on HTTP or rclone error
-    :returns: the JSON decoded response
+    :returns: the undecoded JSON response body
     """
-    url = f"http://{node['ip']}:{node['port']}/rc/{path}"
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            response = await client.post(url, json=payload or {})
-        except httpx.RequestError as exc:
-            raise HTTPException(502, f"Error contacting {node['id']}: {exc}") from exc
+    url = node["_endpoints"].get(path) or node["_base_url"] + path
+    client = _client_for(node)
+    try:
+        response = await client.post(url, json=payload or {}, timeout=httpx.Timeout(timeout, connect=5.0))
+    except httpx.RequestError as exc:
+        raise HTTPException(502, f"Error contacting {node['id']}: {exc}") from exc
     if response.status_code != 200:
         raise HTTPException(502, f"rc error {response.status_code}: {response.text}")
-    return response.json()
+    return response.content
 
 
-def save_job(job: Dict[str, Any]) -> None:
-    """Insert or update a job record in the database."""
-    DB_CONN.execute(
-        """
-        INSERT OR REPLACE INTO jobs(uid, node, kind, src, dst, flags, rc_jobid, status, bytes_done, files_done, created_at, updated_at)
-        VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
-        """,
-        (
-            job["uid"],
-            job["node"],
-            job["kind"],
-            job["src"],
-            job["dst"],
-            json.dumps(job.get("flags", {})),
-            job.get("rc_jobid"),
-            job.get("status", "running"),
-            job.get("bytes_done", 0),
-            job.get("files_done", 0),
-            job.get("created_at", int(time.time())),
-            int(time.time()),
-        ),
-    )
+async def rc_call(node: Dict[str, Any], path: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 300.0) -> Any:
+    """Like `rc_call_bytes`, but return the JSON decoded response."""
+    return orjson.loads(await rc_call_bytes(node, path, payload, timeout))
+
+
+# SQL statements, with columns in table order.
+_JOB_COLUMNS = "uid,node,kind,src,dst,flags,rc_jobid,status,bytes_done,files_done,created_at,updated_at"
+_SQL_INSERT_JOB = f"INSERT INTO jobs({_JOB_COLUMNS}) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)"
+_SQL_SELECT_JOB = f"SELECT {_JOB_COLUMNS} FROM jobs WHERE uid=?"
+_SQL_SELECT_JOB_BY_UID_ONLY = "SELECT uid FROM jobs WHERE uid=?"
+_SQL_SELECT_JOB_STOP = "SELECT node, rc_jobid, status FROM jobs WHERE uid=?"
+_SQL_UPDATE_JOB_STATUS = "UPDATE jobs SET status=?, updated_at=? WHERE uid=?"
+_SQL_UPDATE_JOB_STARTED = "UPDATE jobs SET rc_jobid=?, status=?, updated_at=? WHERE uid=?"
+_SQL_DELETE_JOB = "DELETE FROM jobs WHERE uid=?"
+
+# database column -> API field, for columns whose names differ
+_JOB_FIELD_NAMES = {
+    "bytes_done": "bytesDone",
+    "files_done": "filesDone",
+    "created_at": "createdAt",
+    "updated_at": "updatedAt",
+}
+
+
+def check_query_plans() -> None:
+    """Log the query plan of each lookup, warning about any full table scan."""
+    con = get_conn()
+    for sql in (_SQL_SELECT_JOB, _SQL_SELECT_JOB_BY_UID_ONLY, _SQL_SELECT_JOB_STOP):
+        plan = " / ".join(row["detail"] for row in con.execute("EXPLAIN QUERY PLAN " + sql, ("",)))
+        if "SCAN" in plan:
+            logger.warning("query plan for %r scans the table: %s", sql, plan)
+        else:
+            logger.info("query plan for %r: %s", sql, plan)
+
+
+def dumps_flags(flags: Any) -> str:
+    """Serialise job flags for storage.
+
+    orjson rejects integers wider than 64 bits, which the stdlib accepts, so
+    fall back to `json.dumps` rather than failing.
+    """
+    try:
+        return orjson.dumps(flags).decode()
+    except TypeError:
+        return json.dumps(flags)
 
 
-async def start_operation(kind: str, node_id: str, src: str, dst: str, flags: Dict[str, Any]) -> Dict[str, str]:
-    """Start a copy/move/sync operation on a node and record it as a job.
+def load_job(uid: str) -> Optional[Dict[str, Any]]:
+    """Return a job record in API form, or None if it does not exist.
 
-    The function maps a small set of flags from the API into the rclone RC payload.
-    It then calls the appropriate rclone endpoint (`operations/copyfs`, `operations/movefs` or
-    `sync/sync`) with `_async` set to true.  The returned rclone `jobid` is stored
-    along with a generated job UID.
+    This decodes the stored flags JSON, so call it on a DB thread via
+    `run_db_read` rather than on the event loop.
     """
-    node = CONFIG["nodes"].get(node_id)
-    if not node:
-        raise HTTPException(404, f"Unknown node {node_id}")
-    uid = str(uuid.uuid4())
-    # map input flags to rclone payload
-    op_payload: Dict[str, Any] = {"_async": True, "srcFs": src, "dstFs": dst}
-    # whitelist of supported flags and their RC equivalents
-    flag_map = {
+    row = get_conn().execute(_SQL_SELECT_JOB, (uid,)).fetchone()
+    if row is None:
+        return None
+    job = {_JOB_FIELD_NAMES.get(key, key): row[key] for key in row.keys()}
+    # stdlib json keeps integers wider than 64 bits exact; orjson would turn them into floats
+    job["flags"] = json.loads(job["flags"] or "{}")
+    return job
+
+
+def save_job(job: Dict[str, Any]) -> bool:
+    """Insert a new job record; return False if its UID is already taken.
+
+    `flags` may be given already serialised (see `dumps_flags`).
+    `created_at` and `updated_at` default to the current time if not set.
+    """
+    now = job.get("updated_at") or int(time.time())
+    flags = job.get("flags", {})
+    if not isinstance(flags, str):
+        flags = dumps_flags(flags)
+    con = get_conn()
+    try:
+        with con:
+            con.execute(
+                _SQL_INSERT_JOB,
+                (
+                    job["uid"],
+                    job["node"],
+                    job["kind"],
+                    job["src"],
+                    job["dst"],
+                    flags,
+                    job.get("rc_jobid"),
+                    job.get("status", "running"),
+                    job.get("bytes_done", 0),
+                    job.get("files_done", 0),
+                    job.get("created_at", now),
+                    now,
+                ),
+            )
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+def mark_job_started(uid: str, rc_jobid: Optional[int]) -> None:
+    """Record the rclone job id of a reserved job and mark it running."""
+    con = get_conn()
+    with con:
+        con.execute(_SQL_UPDATE_JOB_STARTED, (rc_jobid, "running", int(time.time()), uid))
+
+
+def delete_job(uid: str) -> None:
+    """Remove a job record, e.g. a reservation whose rclone call failed."""
+    con = get_conn()
+    with con:
+        con.execute(_SQL_DELETE_JOB, (uid,))
+
+
+def set_job_status(uid: str, status: str) -> None:
+    """Update the status of a job."""
+    con = get_conn()
+    with con:
+        con.execute(_SQL_UPDATE_JOB_STATUS, (status, int(time.time()), uid))
+
+
+# Seconds between `core/stats` polls for `/v1/stream`.
+STREAM_INTERVAL = 2.0
+# Ticks buffered per stream client before further ticks are dropped for it.
+STREAM_QUEUE_SIZE = 16
+
+
+async def poll_stats_once() -> List[bytes]:
+    """Poll every node's `core/stats` once and return one NDJSON line per node."""
+    nodes = get_config()["nodes"]
+    # poll all nodes at once so a tick costs one round trip, not one per node
+    stats_list = await asyncio.gather(
+        *(rc_call_bytes(node, "core/stats", {}) for node in nodes.values()), return_exceptions=True
+    )
+    ts = int(time.time())
+    lines = []
+    for node_id, stats in zip(nodes, stats_list):
+        if not isinstance(stats, BaseException):
+            stats = stats.strip()
+        # BaseException also covers a CancelledError returned for one node.  The
+        # brace check is a cheap guard against non-JSON bodies such as a proxy
+        # error page served with status 200, which must not be spliced in.
+        if isinstance(stats, BaseException) or not (stats.startswith(b"{") and stats.endswith(b"}")):
+            lines.append(orjson.dumps({"t": ts, "node": node_id, "error": True}) + b"\n")
+        else:
+            # Splice the stats body into a fixed envelope instead of decoding
+            # and re-encoding it.  rclone indents its JSON; newlines can only
+            # be whitespace there, so dropping them keeps one object per line.
+            stats = stats.replace(b"\r", b"").replace(b"\n", b"")
+            lines.append(b'{"t":%d,"node":%s,"stats":%s}\n' % (ts, orjson.dumps(node_id), stats))
+    return lines
+
+
+async def poll_stats_forever(subscribers: Set["asyncio.Queue[List[bytes]]"], wakeup: asyncio.Event) -> None:
+    """Poll node stats every `STREAM_INTERVAL` and fan each tick out to stream clients.
+
+    One poller serves all connected `/v1/stream` clients.  While nobody is
+    subscribed it waits on `wakeup` instead of polling.  Each subscriber queue
+    receives one list of NDJSON lines per tick; a client that falls behind by
+    more than `STREAM_QUEUE_SIZE` ticks misses ticks rather than growing memory.
+    A failed tick is logged and skipped so it cannot stop the stream.
+    """
+    while True:
+        while not subscribers:
+            wakeup.clear()
+            await wakeup.wait()
+        try:
+            lines = await poll_stats_once()
+        except Exception:
+            logger.exception("stats poll failed")
+        else:
+            for queue in list(subscribers):
+                try:
+                    queue.put_nowait(lines)
+                except asyncio.QueueFull:
+                    pass
+        await asyncio.sleep(STREAM_INTERVAL)
+
+
+def start_stats_poller(state: Any) -> None:
+    """Start `poll_stats_forever` as `state.poller`, restarting it if it ever dies."""
+
+    def restart(task: "asyncio.Task[None]") -> None:
+        if task.cancelled():
+            return
+        logger.error("stats poller stopped unexpectedly; restarting", exc_info=task.exception())
+        start_stats_poller(state)
+
+    state.poller = asyncio.create_task(poll_stats_forever(state.subscribers, state.stream_wakeup))
+    state.poller.add_done_callback(restart)
+
+
+# whitelist of supported job flags and their RC equivalents
+_FLAG_MAP = MappingProxyType(
+    {
         "checksum": "checksum",
         "sizeOnly": "sizeOnly",
         "transfers": "transfers",
@@ -175,29 +496,74 @@ async def start_operation(kind: str, node_id: str, src: str, dst: str, flags: Di
         "ignoreExisting": "ignoreExisting",
         "fastList": "fastList",
     }
-    for key, value in flags.items():
-        if key in flag_map:
-            op_payload[flag_map[key]] = value
+)
+
+_FLAG_KEYS = frozenset(_FLAG_MAP)
+
+# RC path for each job kind
+_PATH_MAP = MappingProxyType({"copy": "operations/copyfs", "move": "operations/movefs", "sync": "sync/sync"})
+
+
+async def start_operation(
+    kind: str,
+    node_id: str,
+    src: str,
+    dst: str,
+    flags: Dict[str, Any],
+    uid: Optional[str] = None,
+    now: Optional[int] = None,
+) -> Dict[str, str]:
+    """Start a copy/move/sync operation on a node and record it as a job.
+
+    The function maps a small set of flags from the API into the rclone RC payload.
+    It then calls the appropriate rclone endpoint (`operations/copyfs`, `operations/movefs` or
+    `sync/sync`) with `_async` set to true.  The returned rclone `jobid` is stored
+    along with the job UID, which is generated unless `uid` is given.  `now`
+    (defaulting to the current time) is used for both job timestamps.
+
+    The job row is reserved with status `starting` before rclone is called.
+    Claiming the UID and checking for it is a single insert on the writer
+    thread, so if another request already holds `uid` (a concurrent retry with
+    the same Idempotency-Key) no second rclone job is started and that UID
+    is returned.  The reservation is removed again if the rclone call fails.
+    """
+    node = get_config()["nodes"].get(node_id)
+    if not node:
+        raise HTTPException(404, f"Unknown node {node_id}")
+    if uid is None:
+        uid = uuid.uuid4().hex
+    # map input flags to rclone payload
+    op_payload: Dict[str, Any] = {"_async": True, "srcFs": src, "dstFs": dst}
+    for key in _FLAG_KEYS & flags.keys():
+        op_payload[_FLAG_MAP[key]] = flags[key]
     # determine RC path based on kind
-    path_map = {"copy": "operations/copyfs", "move": "operations/movefs", "sync": "sync/sync"}
-    if kind not in path_map:
+    rc_path = _PATH_MAP.get(kind)
+    if rc_path is None:
         raise HTTPException(400, f"Unsupported job type: {kind}")
-    rc_path = path_map[kind]
-    # call rclone
-    result = await rc_call(node, rc_path, op_payload)
-    rc_jobid = result.get("jobid")
+    if now is None:
+        now = int(time.time())
     job_record = {
         "uid": uid,
         "node": node_id,
         "kind": kind,
         "src": src,
         "dst": dst,
-        "flags": flags,
-        "rc_jobid": rc_jobid,
-        "status": "running",
-        "created_at": int(time.time()),
+        # serialise before calling rclone so a bad value cannot leave a started job unrecorded
+        "flags": dumps_flags(flags),
+        "status": "starting",
+        "created_at": now,
+        "updated_at": now,
     }
-    save_job(job_record)
+    if not await run_db(save_job, job_record):
+        return {"jobUid": uid}
+    # call rclone
+    try:
+        result = await rc_call(node, rc_path, op_payload)
+        rc_jobid = result.get("jobid")
+    except Exception:
+        await run_db(delete_job, uid)
+        raise
+    await run_db(mark_job_started, uid, rc_jobid)
     return {"jobUid": uid}
 
 
@@ -205,49 +571,112 @@ async def start_operation(kind: str, node_id: str, src: str, dst: str, flags: Di
 # FastAPI app and dependencies
 # ---------------------------------------------------------------------------
 
-app = FastAPI(title="Rclone Hub API", version="1.0.0")
+def _new_http_client(http2: bool) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(300.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+        http2=http2,
+    )
+
+
+def _client_for(node: Dict[str, Any]) -> httpx.AsyncClient:
+    """Return the shared client to use for `node`.
+
+    The HTTP/2 client is only created once a node opts in, so deployments
+    that never enable `http2` do not need the `h2` package.  If it is missing
+    those nodes fall back to the HTTP/1.1 client.
+    """
+    if not node.get("http2"):
+        return app.state.http
+    client = app.state.http2
+    if client is None:
+        try:
+            client = _new_http_client(http2=True)
+        except ImportError:
+            logger.warning("h2 is not installed; using HTTP/1.1 for nodes with http2 enabled")
+            client = app.state.http
+        app.state.http2 = client
+    return client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Reload configuration and manage the shared HTTP clients and DB upkeep.
+
+    Every RC call goes through one of two shared `httpx.AsyncClient`s so that
+    TCP connections to the rclone nodes are reused instead of being set up and
+    torn down per request: an HTTP/1.1 keep-alive client, and an HTTP/2 client
+    created lazily for nodes that opt in with `"http2": true`.
+    """
+    reload_config()
+    # `kill -HUP` forces a config reload without waiting for the mtime check
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass  # no SIGHUP on this platform, or not running in the main thread
+    app.state.http = _new_http_client(http2=False)
+    app.state.http2 = None  # created on first use by _client_for
+    await run_db(lambda: _init_schema(get_conn()))
+    await run_db_read(check_query_plans)
+    app.state.subscribers = set()
+    app.state.stream_wakeup = asyncio.Event()
+    optimizer = asyncio.create_task(optimize_db_forever())
+    start_stats_poller(app.state)
+    try:
+        yield
+    finally:
+        optimizer.cancel()
+        app.state.poller.cancel()
+        if app.state.http2 not in (None, app.state.http):
+            await app.state.http2.aclose()
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Rclone Hub API", version="1.0.0", lifespan=lifespan)
 
 
 def verify_api_key(x_api_key: Optional[str] = Header(None)) -> None:
     """Dependency to verify optional API key."""
-    expected = CONFIG.get("api_key")
+    expected = get_config()["_api_key_bytes"]
     if expected:
-        if x_api_key != expected:
+        if not hmac.compare_digest((x_api_key or "").encode(), expected):
             raise HTTPException(401, "Invalid API key")
 
 
-@app.on_event("startup")
-async def on_startup() -> None:
-    """Reload configuration on startup."""
-    reload_config()
-
-
 @app.get("/v1/nodes", dependencies=[Depends(verify_api_key)])
 async def list_nodes() -> Any:
     """Return health and stats for each configured node.
 
-    Calls `core/stats` on each node.  If a node cannot be reached an object
-    with `ok: false` will be returned.
+    Calls `core/stats` on all nodes concurrently.  If a node cannot be
+    reached an object with `ok: false` will be returned.
     """
+    nodes = get_config()["nodes"]
+    stats_list = await asyncio.gather(
+        *(rc_call(node, "core/stats", {}) for node in nodes.values()), return_exceptions=True
+    )
     results = []
-    for node_id, node in CONFIG["nodes"].items():
-        entry: Dict[str, Any] = {"id": node_id, "name": node.get("name")}
-        try:
-            stats = await rc_call(node, "core/stats", {})
-            entry.update({"ok": True, "stats": stats})
-        except HTTPException:
-            entry.update({"ok": False})
+    for node, stats in zip(nodes.values(), stats_list):
+        if isinstance(stats, HTTPException):
+            entry: Dict[str, Any] = {**node["_public"], "ok": False}
+        elif isinstance(stats, BaseException):
+            raise stats
+        else:
+            entry = {**node["_public"], "ok": True, "stats": stats}
         results.append(entry)
     return results
 
 
 @app.get("/v1/remotes", dependencies=[Depends(verify_api_key)])
 async def list_remotes(node: str = Query(..., description="Node ID")) -> Any:
-    """List rclone remotes on a given node (config/listremotes)."""
-    target = CONFIG["nodes"].get(node)
+    """List rclone remotes on a given node (config/listremotes).
+
+    The agent's response is passed through as-is without being decoded.
+    """
+    target = get_config()["nodes"].get(node)
     if not target:
         raise HTTPException(404, f"Unknown node {node}")
-    return await rc_call(target, "config/listremotes", {})
+    content = await rc_call_bytes(target, "config/listremotes", {})
+    return Response(content=content, media_type="application/json")
 
 
 @app.post("/v1/jobs/{kind}", dependencies=[Depends(verify_api_key)])
@@ -270,65 +699,45 @@ async def create_job(
     flags = body.get("flags", {})
     if not node or not src or not dst:
         raise HTTPException(400, "Missing required fields: node, src, dst")
-    # Idempotency: return existing job if key matches
-    if idempotency_key:
-        row = DB_CONN.execute("SELECT uid FROM jobs WHERE uid=?", (idempotency_key,)).fetchone()
-        if row:
-            return {"jobUid": row[0]}
-    # start the job
-    result = await start_operation(kind, node, src, dst, flags)
-    # If idempotency key provided, overwrite job UID
+    # Idempotency: return existing job if key matches (start_operation repeats
+    # this check atomically for requests that race past it)
     if idempotency_key:
-        DB_CONN.execute("UPDATE jobs SET uid=? WHERE uid=?", (idempotency_key, result["jobUid"]))
-        result["jobUid"] = idempotency_key
-    return result
+        rows = await db_exec(_SQL_SELECT_JOB_BY_UID_ONLY, (idempotency_key,))
+        if rows:
+            return {"jobUid": rows[0]["uid"]}
+    # start the job, using the idempotency key (if any) as its UID
+    return await start_operation(kind, node, src, dst, flags, uid=idempotency_key, now=int(time.time()))
 
 
 @app.get("/v1/jobs/{uid}", dependencies=[Depends(verify_api_key)])
-def job_status(uid: str) -> Any:
+async def job_status(uid: str) -> Any:
     """Return status and progress information for a job."""
-    row = DB_CONN.execute(
-        "SELECT uid,node,kind,src,dst,flags,rc_jobid,status,bytes_done,files_done,created_at,updated_at FROM jobs WHERE uid=?",
-        (uid,),
-    ).fetchone()
-    if not row:
+    job = await run_db_read(load_job, uid)
+    if job is None:
         raise HTTPException(404, "Job not found")
-    return {
-        "uid": row[0],
-        "node": row[1],
-        "kind": row[2],
-        "src": row[3],
-        "dst": row[4],
-        "flags": json.loads(row[5] or "{}"),
-        "rc_jobid": row[6],
-        "status": row[7],
-        "bytesDone": row[8],
-        "filesDone": row[9],
-        "createdAt": row[10],
-        "updatedAt": row[11],
-    }
+    return job
 
 
 @app.post("/v1/jobs/{uid}/stop", dependencies=[Depends(verify_api_key)])
 async def stop_job(uid: str) -> Any:
     """Stop a running job on its node (not yet implemented)."""
     # Look up the job and node
-    row = DB_CONN.execute("SELECT node, rc_jobid, status FROM jobs WHERE uid=?", (uid,)).fetchone()
-    if not row:
+    rows = await db_exec(_SQL_SELECT_JOB_STOP, (uid,))
+    if not rows:
         raise HTTPException(404, "Job not found")
-    node_id, rc_jobid, status = row
+    node_id, rc_jobid, status = rows[0]["node"], rows[0]["rc_jobid"], rows[0]["status"]
     if status != "running":
         return {"uid": uid, "stopped": False, "message": f"Job status is {status}, nothing to stop"}
-    node = CONFIG["nodes"].get(node_id)
+    node = get_config()["nodes"].get(node_id)
     if not node:
         raise HTTPException(404, f"Node {node_id} not found")
     # send stop request
     try:
-        await rc_call(node, "job/stop", {"jobid": rc_jobid})
+        await rc_call_bytes(node, "job/stop", {"jobid": rc_jobid})
     except HTTPException as exc:
         raise exc
     # update status in DB
-    DB_CONN.execute("UPDATE jobs SET status=?, updated_at=? WHERE uid=?", ("stopped", int(time.time()), uid))
+    await run_db(set_job_status, uid, "stopped")
     return {"uid": uid, "stopped": True}
 
 
@@ -338,22 +747,35 @@ async def stream_events() -> StreamingResponse:
 
     The client should read the response line by line.  Each line is a JSON
     object with at least `t` (timestamp) and `node`.  When stats are
-    unavailable the line will contain `error: true`.
+    unavailable the line will contain `error: true`.  Lines are produced by
+    the shared `poll_stats_forever` task; this endpoint only subscribes to it.
     """
 
     async def event_generator():
-        while True:
-            for node_id, node in CONFIG["nodes"].items():
-                try:
-                    stats = await rc_call(node, "core/stats", {})
-                    yield json.dumps({"t": int(time.time()), "node": node_id, "stats": stats}) + "\n"
-                except Exception:
-                    yield json.dumps({"t": int(time.time()), "node": node_id, "error": True}) + "\n"
-            await asyncio.sleep(2)
+        queue: "asyncio.Queue[List[bytes]]" = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        app.state.subscribers.add(queue)
+        app.state.stream_wakeup.set()
+        try:
+            while True:
+                for line in await queue.get():
+                    yield line
+        finally:
+            app.state.subscribers.discard(queue)
 
     return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
 
+@app.post("/v1/admin/reload", dependencies=[Depends(verify_api_key)])
+def admin_reload() -> Dict[str, Any]:
+    """Force the configuration file to be re-read immediately.
+
+    If the file is invalid the previous configuration stays active and
+    `reloaded` is false.
+    """
+    reloaded = reload_config()
+    return {"reloaded": reloaded, "nodes": len(get_config()["nodes"])}
+
+
 # ---------------------------------------------------------------------------
 # Root endpoint
 # ---------------------------------------------------------------------------